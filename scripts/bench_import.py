@@ -0,0 +1,78 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# Benchmark `whow event import` on a synthetic calendar.
+#
+# Usage: python scripts/bench_import.py [number of events] [worker counts...]
+#
+# Everything happens inside a temporary $HOME, so the real data tree is never touched.
+
+import os
+import sys
+import time
+import random
+import datetime
+import resource
+import tempfile
+
+def write_synthetic_ics(path: str, count: int) -> None:
+    rng = random.Random(69)
+    start = datetime.datetime(2015, 1, 1, 8, 0, 0)
+    categories = ["school", "work", "random", "programming", "cooking"]
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//whow//bench//EN\r\n")
+        for i in range(count):
+            begin = start + datetime.timedelta(minutes=rng.randrange(0, 60 * 24 * 365 * 8, 15))
+            f.write("BEGIN:VEVENT\r\n")
+            f.write(f"UID:{i}@whow.bench\r\n")
+            f.write(f"SUMMARY:event number {i}\r\n")
+            if i % 10 == 0:
+                f.write(f"DTSTART;VALUE=DATE:{begin:%Y%m%d}\r\n")
+            else:
+                end = begin + datetime.timedelta(minutes=rng.choice((15, 30, 60, 90)))
+                f.write(f"DTSTART:{begin:%Y%m%dT%H%M%S}Z\r\n")
+                f.write(f"DTEND:{end:%Y%m%dT%H%M%S}Z\r\n")
+            f.write(f"CATEGORIES:{','.join(rng.sample(categories, 2))}\r\n")
+            f.write(f"DESCRIPTION:a fairly long description for event {i}\\, folded over \r\n two lines.\r\n")
+            f.write("END:VEVENT\r\n")
+        f.write("END:VCALENDAR\r\n")
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    worker_counts = [int(w) for w in sys.argv[2:]] or sorted({1, 2, 4, os.cpu_count() or 1})
+
+    home = tempfile.mkdtemp(prefix="whow-bench-")
+    os.environ["HOME"] = home
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+    from whow import base, importers
+
+    ics = os.path.join(home, "synthetic.ics")
+    write_synthetic_ics(ics, count)
+    print(f"{count} events, {os.path.getsize(ics) / 2**20:.1f} MiB")
+
+    for workers in worker_counts:
+        base.init(destroy=True, verbose=False)
+        start = time.perf_counter()
+        imported, skipped = importers.import_events(ics, workers=workers, quiet=True)
+        elapsed = time.perf_counter() - start
+        print(f"workers={workers:<3} {elapsed:8.2f}s {imported / elapsed:10.0f} events/s (skipped {skipped})")
+
+    # ru_maxrss is in KiB on Linux; for children it is the largest single worker
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB (main process)")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024:.1f} MiB (largest worker)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# Benchmark the idle cost of the watch API on a large data tree.
+#
+# Usage: python scripts/bench_watch.py [seconds] [interval]
+#
+# Everything happens inside a temporary $HOME, so the real data tree is never touched.
+
+import os
+import sys
+import time
+import datetime
+import tempfile
+import threading
+
+TODOS = 10_000
+CATEGORIES = 200
+EVENTS = 200_000
+EVENTS_PER_FILE = 2000
+
+def build_tree() -> None:
+    import tomli_w as toml_writer
+    from whow import base, config
+    from whow.data_structures import category, events
+
+    base.init(destroy=True, verbose=False)
+
+    start = datetime.datetime(2015, 1, 1, 8, 0, 0)
+    with open(config.get().todos_file, "wb") as f:
+        toml_writer.dump({"todos": {
+            f"todo_{i}": {
+                "name": f"todo_{i}",
+                "due": (start + datetime.timedelta(days=i % 3000)).date(),
+                "categories": ["important"],
+                "overdue": False,
+                "ticked": i % 3 == 0,
+            }
+            for i in range(TODOS)
+        }}, f)
+
+    for i in range(CATEGORIES):
+        category.register_category(category.Category(f"category {i}"), quiet=True)
+
+    for first in range(0, EVENTS, EVENTS_PER_FILE):
+        events.register_events([
+            {
+                "index": 0,
+                "name": f"event {i}",
+                "full_day": False,
+                "event_from": start + datetime.timedelta(hours=i),
+                "event_to": start + datetime.timedelta(hours=i, minutes=30),
+                "categories": [],
+                "description": "",
+            }
+            for i in range(first, first + EVENTS_PER_FILE)
+        ])
+
+def main() -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="whow-bench-")
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+    from whow import watch
+
+    build_tree()
+
+    start = time.perf_counter()
+    watcher = watch.Watcher(interval)
+    watcher.snapshot()
+    print(f"{TODOS} to-dos, {CATEGORIES} categories, {EVENTS} events in {len(watcher.files)} files")
+    print(f"initial snapshot: {time.perf_counter() - start:.2f}s")
+
+    polls = 200
+    start = time.perf_counter()
+    for _ in range(polls):
+        watcher.poll()
+    print(f"idle poll: {(time.perf_counter() - start) / polls * 1000:.3f} ms")
+
+    stop = threading.Event()
+    threading.Timer(seconds, stop.set).start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for _ in watcher.watch(stop):
+        pass
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    print(f"idle watching for {wall:.1f}s at interval={interval}s: {cpu * 1000:.1f} ms CPU ({cpu / wall * 100:.3f}%)")
+
+if __name__ == "__main__":
+    main()
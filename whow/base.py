@@ -14,19 +14,23 @@
 
 import os
 import shutil
-import util
-import config
+from . import (
+    config,
+    profiling,
+    util
+)
 
-import colors.colors as colors
-import data_structures.category as category
+from .colors import colors
+from .data_structures import category
 
 import tomli_w as toml_writer
 
+@profiling.span("base.init")
 def init(destroy: bool = False, verbose: bool = True) -> None:
     """
     Create the necessary paths for the To-Dos and Events.
     """
-    cfg = config.Config() # no existing config exists yet
+    cfg = config.get() # falls back to the defaults if no config exists yet
     
     util.log("Reconfiguring Whow...") if verbose else None
 
@@ -42,19 +46,20 @@ def init(destroy: bool = False, verbose: bool = True) -> None:
     # create dirs
     dirs = [
         cfg.data_tree_dir,
-        os.path.join(os.environ['HOME'], "./.config/whow")
+        cfg.config_tree_dir,
     ]
 
     tree_dirs = [
             "todos",
             "categories",
             "events",
+            "archive",
     ]
 
     for dir in dirs:
         if not os.path.isdir(dir):
             util.log(f"Created directory {dir}.") if verbose else None
-            os.mkdir(dir)
+            os.makedirs(dir)
 
     for dir in tree_dirs:
         if not os.path.isdir(os.path.join(cfg.data_tree_dir, dir)):
@@ -68,18 +73,23 @@ def init(destroy: bool = False, verbose: bool = True) -> None:
     )
 
     # write the index.toml's
-    todos_indextoml = open(os.path.join(cfg.data_tree_dir, 'todos/index.toml'), "w+")
-    events_indextoml = open(os.path.join(cfg.data_tree_dir, 'events/index.toml'), "w+") 
+    todos_indextoml = profiling.open_file(os.path.join(cfg.data_tree_dir, 'todos/index.toml'), "w+")
+    events_indextoml = profiling.open_file(os.path.join(cfg.data_tree_dir, 'events/index.toml'), "w+") 
     todos_indextoml.write(indextoml_tmp)
     events_indextoml.write(indextoml_tmp)
 
     todos_indextoml.close()
     events_indextoml.close()
 
+    # write the todos.toml, keeping existing to-dos unless destroying
+    if destroy or not os.path.exists(cfg.todos_file):
+        with profiling.open_file(cfg.todos_file, "wb") as f:
+            toml_writer.dump({"todos": {}}, f)
+
     # create the default config.toml
     util.log("Writing configuration file...") if verbose else None
     cfg.write_cfg(quiet=True)
     
     # create a new important category
     util.log("Registering important category...") if verbose else None
-    category.register_category(category.Category("important", colors.RED), cfg, force=True)
\ No newline at end of file
+    category.register_category(category.Category("important", colors.RED), force=True, quiet=True)
\ No newline at end of file
@@ -0,0 +1,217 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import typing
+
+try:
+    import tomllib as toml_reader
+except:
+    import tomli as toml_reader
+
+import tomli_w as toml_writer
+
+from .. import profiling
+
+# where config.toml lives; this can't come from config.toml itself
+DEFAULT_CONFIG_TREE_PATH = "$HOME/.config/whow"
+DEFAULT_DATA_TREE_PATH = "$HOME/.local/whow/"
+
+class ConfigTypedDict(typing.TypedDict):
+    default_separator: str
+    separator_length: int
+    enable_emojis: bool
+    time_format: int
+    data_tree_path: str
+    config_tree_path: str
+    sections: list[str]
+    archive_compression: str
+    archive_after_days: int
+    auto_archive_threshold: int
+
+DEFAULTS: ConfigTypedDict = {
+    "default_separator": "line",
+    "separator_length": 27,
+    "enable_emojis": True,
+    "time_format": 12,
+    "data_tree_path": DEFAULT_DATA_TREE_PATH,
+    "config_tree_path": DEFAULT_CONFIG_TREE_PATH,
+    "sections": [ "separator", "datetime", "separator", "calendar", "separator", "todos", "separator", "events", "separator", "schedule" ],
+    "archive_compression": "gzip", # or "lzma"
+    "archive_after_days": 30, # how long past its due date a to-do is archived
+    "auto_archive_threshold": 0, # archive when todos.toml holds more to-dos than this, 0 disables it
+}
+
+def _expand(path: str) -> str:
+    return os.path.normpath(os.path.expanduser(os.path.expandvars(path)))
+
+class Config():
+    """
+    The whow configuration, as stored in `config.toml`.
+
+    Use `get()` instead of constructing this directly, so that the whole
+    process shares one parsed copy.
+    """
+
+    default_separator: str
+    separator_length: int
+    enable_emojis: bool
+    time_format: int
+    data_tree_path: str
+    config_tree_path: str
+    sections: list[str]
+    archive_compression: str
+    archive_after_days: int
+    auto_archive_threshold: int
+
+    def __init__(self, d: ConfigTypedDict | None = None) -> None:
+        self.update(d if d is not None else {}) # type: ignore
+
+    def update(self, d: ConfigTypedDict) -> None:
+        """
+        Replace the configuration values in-place, falling back to the
+        defaults for missing keys, and re-resolve the paths.
+        """
+
+        for k, v in {**DEFAULTS, **d}.items():
+            if k in DEFAULTS:
+                setattr(self, k, list(v) if isinstance(v, list) else v)
+
+        # resolve $HOME and friends once, every path lookup is served from these
+        self.data_tree_dir = _expand(self.data_tree_path)
+        self.config_tree_dir = _expand(self.config_tree_path)
+        self.todos_file = os.path.join(self.data_tree_dir, "todos.toml")
+        self.categories_dir = os.path.join(self.data_tree_dir, "categories")
+        self.events_dir = os.path.join(self.data_tree_dir, "events")
+        self.schedule_file = os.path.join(self.data_tree_dir, "schedule.toml")
+        self.archive_dir = os.path.join(self.data_tree_dir, "archive")
+
+    @property
+    def config_file(self) -> str:
+        # config.toml can't say where it lives itself, so it is always read
+        # from and written to the default location
+        return _default_config_file()
+
+    def to_dict(self) -> ConfigTypedDict:
+        return {
+            "default_separator": self.default_separator,
+            "separator_length": self.separator_length,
+            "enable_emojis": self.enable_emojis,
+            "time_format": self.time_format,
+            "data_tree_path": self.data_tree_path,
+            "config_tree_path": self.config_tree_path,
+            "sections": self.sections,
+            "archive_compression": self.archive_compression,
+            "archive_after_days": self.archive_after_days,
+            "auto_archive_threshold": self.auto_archive_threshold,
+        }
+
+    def write_cfg(self, quiet: bool = False) -> None:
+        """
+        Write the configuration to `config.toml`.
+        """
+
+        os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+        with profiling.open_file(self.config_file, "wb") as f:
+            toml_writer.dump({"config": dict(self.to_dict())}, f)
+
+        _state.signature = _signature(self.config_file)
+        if not quiet:
+            print(f"Wrote configuration to {self.config_file}")
+
+    def nuke_cfg(self) -> None:
+        """
+        Delete `config.toml`.
+        """
+
+        try:
+            os.remove(self.config_file)
+        except FileNotFoundError:
+            pass
+        _state.signature = None
+
+# the same stat signature the watcher uses for data files: nanosecond mtime,
+# size and inode, so rewrites within one float mtime tick are still noticed
+StatSignature = tuple[int, int, int]
+
+class _State():
+    config: Config | None = None
+    signature: StatSignature | None = None
+    subscribers: list[typing.Callable[[Config], None]] = []
+
+_state = _State()
+
+def _default_config_file() -> str:
+    return os.path.join(_expand(DEFAULT_CONFIG_TREE_PATH), "config.toml")
+
+def _signature(path: str) -> StatSignature | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+@profiling.span("config.load")
+def _load(path: str) -> ConfigTypedDict:
+    try:
+        with profiling.open_file(path, "rb") as f:
+            return toml_reader.load(f).get("config", {}) # type: ignore
+    except FileNotFoundError:
+        return {} # type: ignore
+
+def get() -> Config:
+    """
+    Return the process-wide configuration, parsing `config.toml` on first use.
+    Defaults are used if it does not exist yet.
+    """
+
+    if _state.config is None:
+        path = _default_config_file()
+        _state.signature = _signature(path)
+        _state.config = Config(_load(path))
+    return _state.config
+
+def subscribe(callback: typing.Callable[[Config], None]) -> None:
+    """
+    Call `callback` with the configuration whenever it is reloaded.
+    """
+
+    _state.subscribers.append(callback)
+
+def unsubscribe(callback: typing.Callable[[Config], None]) -> None:
+    try:
+        _state.subscribers.remove(callback)
+    except ValueError:
+        pass
+
+def reload_if_changed() -> bool:
+    """
+    Re-read `config.toml` if its stat signature changed since it was last read,
+    and notify the subscribers. Meant to be polled by long-running frontends.
+
+    Returns whether the configuration was reloaded.
+    """
+
+    cfg = get()
+    path = cfg.config_file
+    signature = _signature(path)
+    if signature == _state.signature:
+        return False
+
+    _state.signature = signature
+    # update in-place, so references held elsewhere stay valid
+    cfg.update(_load(path))
+    for callback in list(_state.subscribers):
+        callback(cfg)
+    return True
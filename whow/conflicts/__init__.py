@@ -0,0 +1,175 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import bisect
+import dataclasses
+import datetime
+import typing
+
+from .. import profiling
+from ..data_structures import events, schedules
+
+# endpoint kinds, in the order they are processed at the same instant:
+# intervals ending there don't overlap ones starting there, but a schedule
+# entry without an end is a single instant that overlaps anything around it
+_END = 0
+_START = 1
+_INSTANT_END = 2
+
+@dataclasses.dataclass
+class Interval():
+    start: datetime.datetime
+    end: datetime.datetime # equal to `start` for schedule entries without an end
+    label: str
+    source: typing.Literal["event", "schedule", "new"]
+    index: int = 0 # the event index, for events
+
+@dataclasses.dataclass
+class Conflict():
+    a: Interval
+    b: Interval
+
+def event_intervals(start: datetime.datetime, end: datetime.datetime, include_full_day: bool = False) -> typing.Iterator[Interval]:
+    """
+    Yield the stored events that overlap `[start, end)` as `Interval`s.
+    Full-day events cover a whole day, so they are left out unless asked for.
+    Only the events files whose time span overlaps the window are read.
+    """
+
+    for d in events.iter_events(start, end):
+        if d["full_day"] and not include_full_day:
+            continue
+        event_from, event_to = events.event_bounds(d)
+        if event_from < end and (event_to > start or event_from >= start):
+            yield Interval(event_from, event_to, d["name"], "event", d["index"])
+
+def schedule_intervals(schedule: schedules.Schedule | None, start: datetime.datetime, end: datetime.datetime) -> typing.Iterator[Interval]:
+    """
+    Yield the schedule occurrences beginning in `[start, end)` as `Interval`s.
+    """
+
+    if schedule is None:
+        return
+    for begin, entry_end, entry in schedule.occurrences(start, end):
+        yield Interval(begin, entry_end if entry_end is not None else begin, entry.label, "schedule")
+
+class Timeline():
+    """
+    Schedule occurrences and events merged into one sorted endpoint stream.
+
+    Building it sorts the endpoints once, in O(n log n). Overlaps are then
+    found with a single sweep, and free slots by walking the merged busy
+    periods from a binary-searched starting point.
+    """
+
+    def __init__(self, intervals: typing.Iterable[Interval]) -> None:
+        self.intervals = list(intervals)
+
+        endpoints: list[tuple[datetime.datetime, int, int]] = []
+        for i, interval in enumerate(self.intervals):
+            endpoints.append((interval.start, _START, i))
+            endpoints.append((interval.end, _END if interval.end > interval.start else _INSTANT_END, i))
+        endpoints.sort()
+        self.endpoints = endpoints
+
+        # merged busy periods, for free-slot queries
+        self.busy: list[tuple[datetime.datetime, datetime.datetime]] = []
+        for interval in sorted(self.intervals, key=lambda i: i.start):
+            if self.busy and interval.start <= self.busy[-1][1]:
+                if interval.end > self.busy[-1][1]:
+                    self.busy[-1] = (self.busy[-1][0], interval.end)
+            else:
+                self.busy.append((interval.start, interval.end))
+        self._busy_ends = [e for _, e in self.busy]
+
+    @profiling.span("conflicts.sweep")
+    def conflicts(self, only: typing.Callable[[Interval], bool] | None = None) -> list[Conflict]:
+        """
+        Return every pair of overlapping intervals. If `only` is given, only
+        pairs with at least one interval it accepts are reported.
+        """
+
+        retval: list[Conflict] = []
+        active: dict[int, Interval] = {}
+
+        for _, kind, i in self.endpoints:
+            interval = self.intervals[i]
+            if kind != _START:
+                active.pop(i, None)
+                continue
+
+            for other in active.values():
+                if only is None or only(interval) or only(other):
+                    retval.append(Conflict(other, interval))
+            active[i] = interval
+
+        return retval
+
+    def next_free_slot(self, length: datetime.timedelta, after: datetime.datetime) -> datetime.datetime:
+        """
+        Return the earliest time at or after `after` where nothing is
+        scheduled for `length`. Only the intervals this timeline was built
+        from are considered, so after its last interval everything is free.
+        """
+
+        candidate = after
+        # skip the busy periods that are over before `after`
+        for start, end in self.busy[bisect.bisect_right(self._busy_ends, after):]:
+            if start - candidate >= length:
+                break
+            candidate = max(candidate, end)
+
+        return candidate
+
+def build_timeline(start: datetime.datetime, end: datetime.datetime, extra: typing.Iterable[Interval] = (), include_full_day: bool = False) -> Timeline:
+    """
+    Build a `Timeline` of the schedule and the stored events within `[start, end)`.
+    """
+
+    return Timeline([
+        *schedule_intervals(schedules.load_schedule(), start, end),
+        *event_intervals(start, end, include_full_day),
+        *extra,
+    ])
+
+@profiling.span("conflicts.check_event_conflicts")
+def check_event_conflicts(event: events.Event) -> list[Interval]:
+    """
+    Return the schedule entries and stored events that overlap `event`,
+    for `event add --check-conflicts`.
+    """
+
+    new = Interval(*events.event_bounds(event.to_dict()), event.name, "new")
+    # a day on either side catches entries that started earlier and run into the event
+    timeline = build_timeline(
+        new.start - datetime.timedelta(days=1),
+        new.end + datetime.timedelta(days=1),
+        extra=[new],
+        include_full_day=event.full_day,
+    )
+
+    retval: list[Interval] = []
+    for conflict in timeline.conflicts(only=lambda i: i is new):
+        retval.append(conflict.b if conflict.a is new else conflict.a)
+    return retval
+
+def next_free_slot(length: datetime.timedelta, after: datetime.datetime, horizon: datetime.timedelta = datetime.timedelta(days=30)) -> datetime.datetime | None:
+    """
+    Return the earliest time after `after` with `length` of free time,
+    looking at most `horizon` ahead. Returns None if there is no such slot.
+    """
+
+    timeline = build_timeline(after - datetime.timedelta(days=1), after + horizon + length)
+    slot = timeline.next_free_slot(length, after)
+    return slot if slot <= after + horizon else None
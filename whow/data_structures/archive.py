@@ -0,0 +1,243 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#    
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+    
+#      http://www.apache.org/licenses/LICENSE-2.0
+    
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import io
+import os
+import gzip
+import contextlib
+import lzma
+import json
+import typing
+import datetime
+
+try:
+    import tomllib as toml_reader
+except:
+    import tomli as toml_reader
+
+import tomli_w as toml_writer
+
+from . import todos
+from .. import (
+    config,
+    exceptions,
+    profiling
+)
+
+# Archived to-dos live in append-only segments, one per month of their due
+# date, as compressed JSON lines: both gzip and xz streams can simply be
+# appended to, which TOML tables can't. archive/index.toml lists the segments
+# with their counts and categories, so queries only open the ones that can match.
+
+COMPRESSION_EXTENSIONS = {
+    "gzip": ".jsonl.gz",
+    "lzma": ".jsonl.xz",
+}
+
+class SegmentTypedDict(typing.TypedDict):
+    file: str
+    count: int
+    categories: list[str]
+
+def _index_path() -> str:
+    return os.path.join(config.get().archive_dir, "index.toml")
+
+def load_index() -> dict[str, SegmentTypedDict]:
+    """
+    Load the archive index, mapping "YYYY-MM" to that month's segment.
+    """
+
+    try:
+        with profiling.open_file(_index_path(), "rb") as f:
+            return toml_reader.load(f).get("segments", {})
+    except FileNotFoundError:
+        return {}
+
+def _write_index(segments: dict[str, SegmentTypedDict]) -> None:
+    with profiling.open_file(_index_path(), "wb") as f:
+        toml_writer.dump({"segments": dict(sorted(segments.items()))}, f)
+
+@contextlib.contextmanager
+def _open_segment(file_name: str, mode: typing.Literal["rt", "at"]) -> typing.Iterator[io.TextIOWrapper]:
+    """
+    Open a segment in text `mode`, going through `profiling.open_file` so
+    the compressed bytes on disk are counted.
+    """
+
+    binary_mode: typing.Literal["rb", "ab"] = "rb" if mode == "rt" else "ab"
+    # the compressed stream doesn't close a file object it was given
+    with profiling.open_file(os.path.join(config.get().archive_dir, file_name), binary_mode) as raw:
+        stream = (
+            lzma.LZMAFile(raw, binary_mode) if file_name.endswith(COMPRESSION_EXTENSIONS["lzma"])
+            else gzip.GzipFile(fileobj=raw, mode=binary_mode)
+        )
+        with io.TextIOWrapper(stream, encoding="utf-8") as f:
+            yield f
+
+def _month(due: datetime.date | None) -> str:
+    return f"{due:%Y-%m}" if due is not None else "undated"
+
+def _to_json(d: todos.ToDoEntryTypedDict, archived: datetime.date) -> str:
+    return json.dumps({
+        **d,
+        "due": d["due"].isoformat() if d.get("due") is not None else None,
+        "archived": archived.isoformat(),
+    })
+
+def _from_json(line: str) -> todos.ToDoEntryTypedDict:
+    d = json.loads(line)
+    if d.get("due") is not None:
+        d["due"] = datetime.date.fromisoformat(d["due"])
+    d.pop("archived", None)
+    return d
+
+def is_archivable(d: todos.ToDoEntryTypedDict, today: datetime.date, after_days: int) -> bool:
+    """
+    Whether a stored to-do should be archived: it is ticked, or its due date
+    passed more than `after_days` days ago. Recurring to-dos are only
+    archived once their rule has ended and they got ticked.
+    """
+
+    if "recurrence" in d and not d.get("ticked", False):
+        return False
+
+    due = d.get("due")
+    return d.get("ticked", False) or (due is not None and (today - due).days > after_days)
+
+@profiling.span("archive.archive_todos")
+def archive_todos(after_days: int | None = None, todos_tree: dict[str, dict[str, todos.ToDoEntryTypedDict]] | None = None) -> str:
+    """
+    Move ticked and long-past to-dos out of todos.toml into the archive.
+
+    `after_days` defaults to `archive_after_days` from the configuration.
+    A caller that already loaded todos.toml can pass it as `todos_tree`
+    (the archived entries are removed from it) instead of it being read again.
+    The archive is appended to before todos.toml is rewritten, so an
+    interruption can at worst leave a to-do in both places.
+    """
+
+    cfg = config.get()
+    after_days = after_days if after_days is not None else cfg.archive_after_days
+    if cfg.archive_compression not in COMPRESSION_EXTENSIONS:
+        raise exceptions.FatalError(f"Unknown archive compression {cfg.archive_compression}, it has to be either gzip or lzma.")
+
+    if todos_tree is None:
+        with profiling.open_file(cfg.todos_file, "rb") as f:
+            todos_tree = toml_reader.load(f) # type: ignore
+
+    today = profiling.now().date()
+    by_month: dict[str, list[str]] = {}
+    for key, d in todos_tree["todos"].items():
+        if is_archivable(d, today, after_days):
+            by_month.setdefault(_month(d.get("due")), []).append(key)
+
+    if not by_month:
+        return "Nothing to archive."
+
+    os.makedirs(cfg.archive_dir, exist_ok=True)
+    segments = load_index()
+    archived = 0
+
+    for month, keys in by_month.items():
+        # a month keeps the format it was started with
+        segment = segments.setdefault(month, {
+            "file": f"todos-{month}{COMPRESSION_EXTENSIONS[cfg.archive_compression]}",
+            "count": 0,
+            "categories": [],
+        })
+
+        # every append adds a new gzip member/xz stream to the segment
+        with _open_segment(segment["file"], "at") as f:
+            for key in keys:
+                f.write(_to_json(todos_tree["todos"][key], today) + "\n")
+
+        categories = set(segment["categories"])
+        for key in keys:
+            categories.update(todos_tree["todos"][key].get("categories", []))
+        segment["categories"] = sorted(categories)
+        segment["count"] += len(keys)
+        archived += len(keys)
+
+    _write_index(segments)
+
+    for keys in by_month.values():
+        for key in keys:
+            todos_tree["todos"].pop(key)
+
+    with profiling.open_file(cfg.todos_file, "wb") as f:
+        toml_writer.dump(todos_tree, f)
+
+    return f"Archived {archived} to-dos."
+
+def auto_archive(todos_tree: dict[str, dict[str, todos.ToDoEntryTypedDict]]) -> None:
+    """
+    Archive if the freshly written `todos_tree` holds more than
+    `auto_archive_threshold` to-dos and any of them is archivable.
+    """
+
+    cfg = config.get()
+    if not cfg.auto_archive_threshold or len(todos_tree["todos"]) <= cfg.auto_archive_threshold:
+        return
+
+    # over the threshold with nothing to archive is the common case, don't touch the disk then
+    today = profiling.now().date()
+    if any(is_archivable(d, today, cfg.archive_after_days) for d in todos_tree["todos"].values()):
+        archive_todos(todos_tree=todos_tree)
+
+@profiling.span("archive.iter_archived")
+def iter_archived(
+    filter: typing.Callable[[todos.LazyToDoEntry], bool] | None = None,
+    since: datetime.date | None = None,
+    until: datetime.date | None = None,
+    category: str | None = None,
+) -> typing.Iterator[todos.LazyToDoEntry]:
+    """
+    Stream archived to-dos, oldest month first.
+
+    `since`/`until` bound the due date (inclusive) and `category` has to be
+    one of the to-do's categories. Segments that can't match either are
+    skipped using the index alone, and the others are decompressed line by
+    line as they are iterated. The yielded entries have an `index` of -1,
+    since they are not in todos.toml.
+    """
+
+    months = sorted(load_index().items())
+    first = f"{since:%Y-%m}" if since is not None else None
+    last = f"{until:%Y-%m}" if until is not None else None
+
+    def matching_segments() -> typing.Iterator[SegmentTypedDict]:
+        for month, segment in months:
+            if month == "undated":
+                if since is not None or until is not None:
+                    continue
+            elif (first is not None and month < first) or (last is not None and month > last):
+                continue
+            if category is not None and category not in segment["categories"]:
+                continue
+            yield segment
+
+    for segment in matching_segments():
+        with _open_segment(segment["file"], "rt") as f:
+            for line in f:
+                d = _from_json(line)
+                due = d.get("due")
+                if since is not None and (due is None or due < since):
+                    continue
+                if until is not None and (due is None or due > until):
+                    continue
+                if category is not None and category not in d.get("categories", []):
+                    continue
+                t = todos.LazyToDoEntry(d["name"], d, -1)
+                if filter is None or filter(t):
+                    yield t
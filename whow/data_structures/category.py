@@ -15,10 +15,18 @@
 import os
 import dataclasses
 import typing
+
+try:
+    import tomllib as toml_reader
+except:
+    import tomli as toml_reader
+
 import tomli_w as toml_writer
 
 from .. import util
+from .. import config
 from .. import exceptions
+from .. import profiling
 from ..colors import colors, styles
 
 class CategoryTypedDict(typing.TypedDict):
@@ -46,76 +54,84 @@ def from_dict(d: CategoryTypedDict) -> Category:
         colors.from_name(d["color"].lower())
     )
     
+@profiling.span("category.from_name")
 def from_name(s: str) -> Category:
     """
     Parse a dictionary that was parsed rom a `Category` back into a `Category`.
     """
 
-    BASEDIR = os.path.join(os.environ["HOME"], "./.local/categories")
+    BASEDIR = config.get().categories_dir
     for category_filename in os.listdir(BASEDIR):
-        with open(os.path.join(BASEDIR, category_filename), "rb") as f:
+        with profiling.open_file(os.path.join(BASEDIR, category_filename), "rb") as f:
             c: CategoryTypedDict = toml_reader.load(f) # type: ignore
             if c["name"].lower() == s:
                 return Category(s, colors.from_name(c["color"]))
     raise NameError("The category name was not found! perhaps you did not add it yet?")
 
+@profiling.span("category.check_category_existence")
 def check_category_existence(name: str) -> bool:
     """
     Check for the existence of a given category by searching through the category directory.
     """
-    for path in os.listdir(os.path.join(os.environ["HOME"], "./.local/categories")):
+    for path in os.listdir(config.get().categories_dir):
         if (name == os.path.splitext(path)[0]) or (name.lower() == os.path.splitext(path)[0].lower()):
             return True
     return False
 
+@profiling.span("category.match_name_with_category")
 def match_name_with_category(name: str) -> Category:
     """
     Get a category class, given the name of an
     existing category.
     """
     
-    for path in os.listdir(os.path.join(os.environ["HOME"], "./.local/categories")):
+    for path in os.listdir(config.get().categories_dir):
         if os.path.splitext(path)[0] == name:
             try:
-                with open(os.path.join(os.environ["HOME"], "./.local/categories", path), "rb") as f:
+                with profiling.open_file(os.path.join(config.get().categories_dir, path), "rb") as f:
                     toml_dict: CategoryTypedDict = toml_reader.load(f) # type: ignore
                     return from_name(toml_dict["name"])
             except NameError:
                 break
     raise NameError("The category name was not found! Perhaps you did not add it yet?")
 
+@profiling.span("category.match_category_name_with_filename")
 def match_category_name_with_filename(name: str) -> str:
     """
     Find a filename based on the category name.
     """
     name = name.replace(" ", "_").lower()
 
-    for n in os.listdir(os.path.join(os.environ["HOME"], "./.local/categories")):
+    for n in os.listdir(config.get().categories_dir):
         if n == f"{name}.toml":
             return (n)
 
     raise NameError("No category found with name!")
 
+@profiling.span("category.register_category")
 def register_category(category: Category, force: bool = False, quiet: bool = False) -> None:
     """
     Register a new category.
     """
     
-    if os.path.exists(os.path.join(os.environ["HOME"], "./.local/categories/{n}.toml")):
+    path = os.path.join(config.get().categories_dir, f"{category.name.replace(' ', '_').lower()}.toml")
+
+    if os.path.exists(path):
         if not force:
             if not quiet:
                 raise exceptions.FatalError("A category entry with the same name exists. Aborting...")
         util.warn("A category entry with the same name already exists. Overwriting...") if not quiet else None
 
-    with open(os.path.join(os.environ["HOME"], './.local/categories/{n}.toml'), "wb") as f:
+    with profiling.open_file(path, "wb") as f:
         c_dict = dict(category.get_dict())
         toml_writer.dump(c_dict, f)
 
+@profiling.span("category.del_category")
 def del_category(name: str) -> str:
     """
     Delete a category by its name.
     """
-    BASEDIR = os.path.join(os.path.join(os.environ["HOME"], "categories"))
+    BASEDIR = config.get().categories_dir
     try:
         filename = match_category_name_with_filename(name)
         os.remove(os.path.join(BASEDIR, filename))
@@ -124,15 +140,16 @@ def del_category(name: str) -> str:
         util.error("A category with this name does not exist! please re-evaluate your input.")
     return ""
     
+@profiling.span("category.get_categories_list")
 def get_categories_list() -> list[Category]:
     """
     Get a list of all categories that exist.
     """
     
     retval: list[Category] = []
-    for path in os.listdir(os.path.join(os.environ["HOME"], "./.local/categories")):
+    for path in os.listdir(config.get().categories_dir):
         try:
-            with open(os.path.join(os.environ["HOME"], "./.local/categories", path), "rb") as f:
+            with profiling.open_file(os.path.join(config.get().categories_dir, path), "rb") as f:
                 toml_dict: CategoryTypedDict = toml_reader.load(f) # type: ignore
                 retval.append(from_dict(toml_dict))
         except KeyError or TypeError:
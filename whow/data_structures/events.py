@@ -11,3 +11,211 @@
 #    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
+
+import os
+import dataclasses
+import typing
+import datetime
+
+try:
+    import tomllib as toml_reader
+except:
+    import tomli as toml_reader
+
+import tomli_w as toml_writer
+
+from . import category
+from .. import (
+    config,
+    profiling
+)
+
+class EventTypedDict(typing.TypedDict):
+    index: int
+    name: str
+    full_day: bool
+    event_from: datetime.datetime
+    event_to: datetime.datetime
+    categories: list[str]
+    description: str
+
+class EventRangeTypedDict(typing.TypedDict):
+    start: datetime.datetime
+    end: datetime.datetime
+
+class EventsIndexTypedDict(typing.TypedDict):
+    indexes: list[str]
+    next_index: int
+    ranges: dict[str, EventRangeTypedDict] # the time span of every file, by file name
+
+@dataclasses.dataclass
+class Event():
+    name: str
+    event_from: datetime.datetime
+    event_to: datetime.datetime
+    full_day: bool = False
+    categories: list[category.Category] = dataclasses.field(default_factory=list)
+    description: str = ""
+    index: int = 0
+
+    def to_dict(self) -> EventTypedDict:
+        return {
+            "index": self.index,
+            "name": self.name,
+            "full_day": self.full_day,
+            "event_from": self.event_from,
+            "event_to": self.event_to,
+            "categories": [c.name for c in self.categories],
+            "description": self.description,
+        }
+
+    @staticmethod
+    @profiling.span("events.parse_entry")
+    def from_dict(d: EventTypedDict):
+        """
+        Parse a dictionary that was parsed from an `Event` into an `Event`.
+        """
+        return Event(
+            d["name"].replace("_", " "),
+            d["event_from"],
+            d["event_to"],
+            full_day=d["full_day"],
+            categories=[category.from_name(c) for c in d["categories"]],
+            description=d.get("description", ""),
+            index=d.get("index", 0),
+        )
+
+def event_bounds(d: EventTypedDict) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    Return the time an event occupies. Full-day events cover their days
+    from midnight to midnight, also when stored with `event_to` equal to
+    `event_from`.
+    """
+
+    if not d["full_day"]:
+        return d["event_from"], max(d["event_to"], d["event_from"])
+
+    start = datetime.datetime.combine(d["event_from"].date(), datetime.time())
+    end = datetime.datetime.combine(d["event_to"].date(), datetime.time())
+    if end < d["event_to"]:
+        end += datetime.timedelta(days=1)
+    return start, max(end, start + datetime.timedelta(days=1))
+
+def events_range(event_dicts: list[EventTypedDict]) -> EventRangeTypedDict | None:
+    """
+    Return the time span of a batch of events, for the events index.
+    """
+
+    if not event_dicts:
+        return None
+
+    bounds = [event_bounds(d) for d in event_dicts]
+    return {"start": min(b[0] for b in bounds), "end": max(b[1] for b in bounds)}
+
+def _index_path() -> str:
+    return os.path.join(config.get().events_dir, "index.toml")
+
+def load_index() -> EventsIndexTypedDict:
+    """
+    Load the events index, which lists the files events are stored in.
+    """
+
+    with profiling.open_file(_index_path(), "rb") as f:
+        index: EventsIndexTypedDict = toml_reader.load(f) # type: ignore
+
+    # older index.toml's only have the "indexes" key
+    index.setdefault("next_index", 0)
+    index.setdefault("ranges", {})
+    return index
+
+def write_index(index: EventsIndexTypedDict) -> None:
+    with profiling.open_file(_index_path(), "wb") as f:
+        toml_writer.dump(dict(index), f)
+
+def dump_events(event_dicts: list[EventTypedDict], first: int) -> str:
+    """
+    Serialize a batch of events into the contents of one events file,
+    numbering them from `first`. The `index` of every entry is overwritten.
+    """
+
+    tree: dict[str, EventTypedDict] = {}
+    for i, d in enumerate(event_dicts):
+        d["index"] = first + i
+        key = d["name"].replace(" ", "_")
+        if key in tree:
+            key = f"{key}_{d['index']}"
+        tree[key] = d
+
+    return toml_writer.dumps(tree)
+
+@profiling.span("events.store_events")
+def store_events(first: int, toml_text: str, next_index: int, span: EventRangeTypedDict | None = None) -> None:
+    """
+    Write a batch serialized by `dump_events` and add it to the index.
+    `next_index` is the first index that is still free afterwards, and
+    `span` is the `events_range` of the batch, which lets time-bounded
+    queries skip the file.
+    """
+
+    file_name = f"{first}.toml"
+    with profiling.open_file(os.path.join(config.get().events_dir, file_name), "w", encoding="utf-8") as f:
+        f.write(toml_text)
+
+    index = load_index()
+    index["indexes"].append(file_name)
+    index["next_index"] = max(index["next_index"], next_index)
+    if span is not None:
+        index["ranges"][file_name] = span
+    write_index(index)
+
+@profiling.span("events.register_events")
+def register_events(event_dicts: list[EventTypedDict]) -> int:
+    """
+    Register a batch of events at once.
+
+    The whole batch goes into a single file in the events directory, and the
+    index is only rewritten once, so this is what bulk imports should use.
+    Returns the number of events written.
+    """
+
+    if not event_dicts:
+        return 0
+
+    first = load_index()["next_index"]
+    store_events(first, dump_events(event_dicts, first), first + len(event_dicts), events_range(event_dicts))
+
+    return len(event_dicts)
+
+def iter_events(start: datetime.datetime | None = None, end: datetime.datetime | None = None) -> typing.Iterator[EventTypedDict]:
+    """
+    Iterate over the stored events, one events file at a time.
+
+    If `start`/`end` are given, files whose recorded time span lies
+    entirely before `start` or at/after `end` are not read at all. The
+    events of the files that are read are yielded unfiltered, so callers
+    still have to check each one. Files without a recorded span (written
+    by older versions) are always read.
+    """
+
+    index = load_index()
+    for file_name in index["indexes"]:
+        span = index["ranges"].get(file_name)
+        if span is not None and ((end is not None and span["start"] >= end) or (start is not None and span["end"] < start)):
+            continue
+        try:
+            with profiling.open_file(os.path.join(config.get().events_dir, file_name), "rb") as f:
+                tree: dict[str, EventTypedDict] = toml_reader.load(f) # type: ignore
+        except FileNotFoundError:
+            continue
+        yield from tree.values()
+
+def register_event(event: Event) -> str:
+    """
+    Register a new event.
+    """
+
+    event_dict = event.to_dict()
+    register_events([event_dict])
+    event.index = event_dict["index"]
+
+    return f"Registered New Event: \n{toml_writer.dumps(dict(event_dict))}"
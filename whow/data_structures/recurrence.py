@@ -0,0 +1,203 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#    
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+    
+#      http://www.apache.org/licenses/LICENSE-2.0
+    
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import bisect
+import calendar
+import dataclasses
+import datetime
+import typing
+
+from .. import exceptions
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+WEEKDAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+Unit = typing.Literal["days", "weeks", "months"]
+
+class _RecurrenceRequiredTypedDict(typing.TypedDict):
+    unit: Unit
+    anchor: datetime.date
+
+# NotRequired needs Python 3.11, so the optional keys go in a subclass
+class RecurrenceTypedDict(_RecurrenceRequiredTypedDict, total=False):
+    every: int
+    weekdays: list[str]
+    day: int
+    until: datetime.date
+
+def _months(d: datetime.date) -> int:
+    return d.year * 12 + d.month - 1
+
+def _day_in_month(months: int, day: int) -> datetime.date:
+    """
+    The `day`th of the month `months` months after year 0, clamped to the
+    length of that month (so the 31st is the 30th in April).
+    """
+
+    year, month = divmod(months, 12)
+    return datetime.date(year, month + 1, min(day, calendar.monthrange(year, month + 1)[1]))
+
+@dataclasses.dataclass
+class Recurrence():
+    """
+    A recurrence rule: every `every` days, weeks (optionally on some
+    `weekdays`, 0 == Monday) or months (on `day` of the month), counted from
+    the `anchor` date, optionally ending on `until`.
+
+    `next_after` computes the next occurrence arithmetically, so only the
+    current instance of a recurring to-do ever has to be stored.
+    """
+
+    unit: Unit
+    anchor: datetime.date
+    every: int = 1
+    weekdays: list[int] = dataclasses.field(default_factory=list)
+    day: int | None = None
+    until: datetime.date | None = None
+
+    def __post_init__(self) -> None:
+        if self.every < 1:
+            raise exceptions.FatalError("A to-do can't repeat every 0 or less days, weeks or months!")
+        self.weekdays = sorted(set(self.weekdays))
+
+    def _next_step(self, x: datetime.date, step: int) -> datetime.date:
+        # the first anchor + k * step days that is on or after x
+        periods = -(-(x - self.anchor).days // step) # ceiling division
+        return self.anchor + datetime.timedelta(days=periods * step)
+
+    def next_after(self, d: datetime.date) -> datetime.date | None:
+        """
+        Return the first occurrence strictly after `d`, or None if the rule
+        has ended by then. Runs in constant time.
+        """
+
+        # the earliest day that could be an occurrence
+        x = max(d + datetime.timedelta(days=1), self.anchor)
+
+        match self.unit:
+            case "days":
+                retval = self._next_step(x, self.every)
+
+            case "weeks" if not self.weekdays:
+                retval = self._next_step(x, self.every * 7)
+
+            case "weeks":
+                anchor_monday = self.anchor - datetime.timedelta(days=self.anchor.weekday())
+                week = (x - anchor_monday).days // 7
+                i = bisect.bisect_left(self.weekdays, x.weekday())
+                if week % self.every == 0 and i < len(self.weekdays):
+                    retval = x + datetime.timedelta(days=self.weekdays[i] - x.weekday())
+                else:
+                    week += self.every - week % self.every
+                    retval = anchor_monday + datetime.timedelta(weeks=week, days=self.weekdays[0])
+
+            case "months":
+                day = self.day if self.day is not None else self.anchor.day
+                months = _months(x) - _months(self.anchor)
+                retval = _day_in_month(_months(x), day)
+                if months % self.every != 0 or retval < x:
+                    months += self.every - months % self.every
+                    retval = _day_in_month(_months(self.anchor) + months, day)
+
+            case _:
+                raise exceptions.FatalError(f"Invalid recurrence unit {self.unit} - it has to be days, weeks or months.")
+
+        if self.until is not None and retval > self.until:
+            return None
+        return retval
+
+    def occurrences(self, after: datetime.date, until: datetime.date | None = None) -> typing.Iterator[datetime.date]:
+        """
+        Lazily yield the occurrences after `after`, up to and including `until`
+        (or for as long as the rule lasts).
+        """
+
+        d = self.next_after(after)
+        while d is not None and (until is None or d <= until):
+            yield d
+            d = self.next_after(d)
+
+    def to_dict(self) -> RecurrenceTypedDict:
+        d: RecurrenceTypedDict = {
+            "unit": self.unit,
+            "every": self.every,
+            "anchor": self.anchor,
+        }
+        if self.weekdays:
+            d["weekdays"] = [WEEKDAYS[w] for w in self.weekdays]
+        if self.day is not None:
+            d["day"] = self.day
+        if self.until is not None:
+            d["until"] = self.until
+        return d
+
+    @staticmethod
+    def from_dict(d: RecurrenceTypedDict):
+        """
+        Parse a dictionary that was parsed from a `Recurrence` back into a `Recurrence`.
+        """
+
+        return Recurrence(
+            d["unit"],
+            d["anchor"],
+            every=d.get("every", 1),
+            weekdays=[WEEKDAYS.index(w.lower()[:3]) for w in d.get("weekdays", [])],
+            day=d.get("day"),
+            until=d.get("until"),
+        )
+
+def _weekday(word: str) -> int | None:
+    # only whole tokens, so that e.g. "month" isn't taken for "mon"
+    if word in WEEKDAYS:
+        return WEEKDAYS.index(word)
+    if word in WEEKDAY_NAMES:
+        return WEEKDAY_NAMES.index(word)
+    return None
+
+def parse(string: str, anchor: datetime.date) -> Recurrence:
+    """
+    Parse a rule written like "every 3 days", "every 2 weeks on mon,thu",
+    "every mon,fri", "every month on 15" or "every 2 months".
+    """
+
+    words = string.lower().replace(",", " ").split()
+    if not words or words[0] != "every":
+        raise exceptions.FatalError(f"Invalid recurrence \"{string}\" - it has to start with \"every\".")
+    words.pop(0)
+
+    every = 1
+    if words and words[0].isdigit():
+        every = int(words.pop(0))
+
+    weekdays = [w for w in map(_weekday, words) if w is not None]
+    if not words:
+        raise exceptions.FatalError(f"Invalid recurrence \"{string}\" - it needs a unit, e.g. \"every 2 weeks\".")
+
+    if _weekday(words[0]) is not None:
+        # "every mon,thu"
+        return Recurrence("weeks", anchor, every, weekdays)
+
+    unit = words[0].rstrip("s") + "s"
+    if unit not in ("days", "weeks", "months"):
+        raise exceptions.FatalError(f"Invalid recurrence \"{string}\" - the unit has to be days, weeks or months.")
+    if weekdays and unit != "weeks":
+        raise exceptions.FatalError(f"Invalid recurrence \"{string}\" - weekdays can only be given for weekly rules.")
+
+    day = None
+    if unit == "months" and words[-1].isdigit():
+        day = int(words[-1])
+        if not 1 <= day <= 31:
+            raise exceptions.FatalError(f"Invalid recurrence \"{string}\" - the day of the month has to be between 1 and 31.")
+
+    return Recurrence(unit, anchor, every, weekdays if unit == "weeks" else [], day) # type: ignore
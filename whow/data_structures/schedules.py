@@ -11,3 +11,109 @@
 #    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
+
+import dataclasses
+import typing
+import datetime
+
+try:
+    import tomllib as toml_reader
+except:
+    import tomli as toml_reader
+
+from .. import (
+    config,
+    profiling
+)
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+class ScheduleEntryTypedDict(typing.TypedDict):
+    begin: datetime.time
+    end: datetime.time | str
+    label: str
+    categories: list[str]
+
+@dataclasses.dataclass
+class ScheduleEntry():
+    begin: datetime.time
+    end: datetime.time | None # None means it has no set end
+    label: str
+    categories: list[str]
+
+    @staticmethod
+    def from_dict(d: ScheduleEntryTypedDict):
+        return ScheduleEntry(
+            d["begin"],
+            d["end"] if isinstance(d["end"], datetime.time) else None,
+            d.get("label", ""),
+            d.get("categories", []),
+        )
+
+@dataclasses.dataclass
+class ScheduleDay():
+    name: str
+    entries: list[ScheduleEntry]
+    repeats: bool # if False, the day only happens in the anchor week
+
+@dataclasses.dataclass
+class Schedule():
+    anchor_date: datetime.date
+    days: dict[str, ScheduleDay]
+
+    def occurrences(self, start: datetime.datetime, end: datetime.datetime) -> typing.Iterator[tuple[datetime.datetime, datetime.datetime | None, ScheduleEntry]]:
+        """
+        Yield `(begin, end, entry)` for every occurrence of a schedule entry
+        that begins in `[start, end)`, in chronological order. `end` is None
+        for entries without a set end.
+        """
+
+        anchor_monday = self.anchor_date - datetime.timedelta(days=self.anchor_date.weekday())
+        day = start.date()
+        while day <= end.date():
+            schedule_day = self.days.get(WEEKDAYS[day.weekday()])
+            in_anchor_week = 0 <= (day - anchor_monday).days < 7
+
+            if schedule_day is not None and (schedule_day.repeats or in_anchor_week):
+                for entry in sorted(schedule_day.entries, key=lambda e: e.begin):
+                    begin = datetime.datetime.combine(day, entry.begin)
+                    if not start <= begin < end:
+                        continue
+                    entry_end = datetime.datetime.combine(day, entry.end) if entry.end is not None else None
+                    if entry_end is not None and entry_end < begin:
+                        # ends past midnight
+                        entry_end += datetime.timedelta(days=1)
+                    yield begin, entry_end, entry
+
+            day += datetime.timedelta(days=1)
+
+def from_dict(d: dict[str, typing.Any]) -> Schedule:
+    """
+    Parse a dictionary in the format of `res/sample_schedule.toml` into a `Schedule`.
+    """
+
+    s = d["schedule"]
+    repeats = [r.lower() for r in s.get("repeats", [])]
+    return Schedule(
+        s["anchor_date"],
+        {
+            name.lower(): ScheduleDay(
+                name.lower(),
+                [ScheduleEntry.from_dict(e) for e in entries],
+                name.lower() in repeats,
+            )
+            for name, entries in s.get("days", {}).items()
+        },
+    )
+
+@profiling.span("schedules.load_schedule")
+def load_schedule() -> Schedule | None:
+    """
+    Load the schedule, returning None if there is none.
+    """
+
+    try:
+        with profiling.open_file(config.get().schedule_file, "rb") as f:
+            return from_dict(toml_reader.load(f))
+    except FileNotFoundError:
+        return None
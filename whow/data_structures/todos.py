@@ -12,8 +12,10 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-import os
+import heapq
 import dataclasses
+import functools
+import itertools
 import typing
 import datetime
 
@@ -25,8 +27,11 @@ except:
 import tomli_w as toml_writer
 
 from . import category
+from .recurrence import Recurrence, RecurrenceTypedDict
 from .. import (
+    config,
     exceptions,
+    profiling,
     util
 )
 
@@ -36,6 +41,7 @@ class ToDoEntryTypedDict(typing.TypedDict):
     categories: list[str]
     overdue: bool
     ticked: bool
+    recurrence: RecurrenceTypedDict # only present on recurring to-dos
 
 @dataclasses.dataclass
 class ToDoEntry():
@@ -45,22 +51,27 @@ class ToDoEntry():
     overdue: bool = False
     ticked: bool = False
     index: int = 0
+    recurrence: Recurrence | None = None
 
+    @profiling.span("todos.dump_entry")
     def to_dict(self) -> ToDoEntryTypedDict:
-        todo_entry_due = self.due if self.due is not None else datetime.datetime.now().date()
+        today = profiling.now().date()
+        todo_entry_due = self.due if self.due is not None else today
 
-        return {
+        d: ToDoEntryTypedDict = {
             "name": self.name,
-            "due": todo_entry_due
-                   if self.due is not None else
-                   datetime.datetime.now().date(),
+            "due": todo_entry_due,
             "categories": [c.name for c in self.categories],
-            "overdue": False if datetime.datetime.now().date() < todo_entry_due else True,
+            "overdue": False if today < todo_entry_due else True,
             "ticked": self.ticked
-        }
-        
+        } # type: ignore
+        if self.recurrence is not None:
+            d["recurrence"] = self.recurrence.to_dict()
+
+        return d
 
     @staticmethod
+    @profiling.span("todos.parse_entry")
     def from_dict(d: ToDoEntryTypedDict):
         """
         Parse a dictionary that was parsed from a `ToDoEntry` into a `ToDoEntry`.
@@ -70,21 +81,160 @@ class ToDoEntry():
             d["name"].replace("_", " "),
             d["due"],
             [category.from_name(c) for c in d["categories"]],
-            overdue=True if d["overdue"] or (datetime.datetime.now().date() > d["due"]) else False,
-            ticked=d["ticked"],
+            overdue=True if d.get("overdue", False) or (profiling.now().date() > d["due"]) else False,
+            ticked=d.get("ticked", False),
+            recurrence=Recurrence.from_dict(d["recurrence"]) if "recurrence" in d else None,
         )
 
+    def advance(self, today: datetime.date | None = None) -> bool:
+        """
+        Move a recurring to-do on to its next occurrence after both its
+        current due date and `today`, skipping the ones that were missed.
+        Returns False if it doesn't recur or its rule has ended.
+        """
+
+        if self.recurrence is None:
+            return False
+
+        today = today if today is not None else profiling.now().date()
+        after = max(self.due, today) if self.due is not None else today
+        next_due = self.recurrence.next_after(after)
+        if next_due is None:
+            return False
+
+        self.due = next_due
+        self.ticked = False
+        return True
+
+class LazyToDoEntry():
+    """
+    A read-only view of a stored to-do.
+
+    Only the fields stored as plain values are set up front. The categories
+    (which need file I/O to resolve) and `overdue` are computed on first
+    access, so listing a page of to-dos only pays for what is displayed.
+    """
+
+    def __init__(self, key: str, d: ToDoEntryTypedDict, index: int) -> None:
+        self.key = key
+        self.index = index
+        self.name: str = d["name"].replace("_", " ")
+        self.due: datetime.date | None = d.get("due")
+        self.ticked: bool = d.get("ticked", False)
+        self._d = d
+
+    @functools.cached_property
+    def categories(self) -> list[category.Category]:
+        return [category.from_name(c) for c in self._d.get("categories", [])]
+
+    @property
+    def category_names(self) -> list[str]:
+        return list(self._d.get("categories", []))
+
+    @functools.cached_property
+    def recurrence(self) -> Recurrence | None:
+        return Recurrence.from_dict(self._d["recurrence"]) if "recurrence" in self._d else None
+
+    @functools.cached_property
+    def overdue(self) -> bool:
+        return self._d.get("overdue", False) or (self.due is not None and profiling.now().date() > self.due)
+
+    def hydrate(self) -> ToDoEntry:
+        """
+        Resolve everything into a full `ToDoEntry`.
+        """
+
+        return ToDoEntry(self.name, self.due, self.categories, overdue=self.overdue, ticked=self.ticked, index=self.index, recurrence=self.recurrence)
+
+    def __repr__(self) -> str:
+        return f"LazyToDoEntry(index={self.index}, name={self.name!r}, due={self.due!r}, ticked={self.ticked})"
+
+@profiling.span("todos.load")
+def _load_todos() -> dict[str, ToDoEntryTypedDict]:
+    with profiling.open_file(config.get().todos_file, "rb") as f:
+        return toml_reader.load(f).get("todos", {})
+
+def _due_order(t: LazyToDoEntry) -> tuple[bool, datetime.date]:
+    # to-dos without a due date go last
+    return (t.due is None, t.due or datetime.date.max)
+
+ORDERS: dict[str, typing.Callable[[LazyToDoEntry], typing.Any]] = {
+    "due": _due_order,
+    "name": lambda t: t.name.lower(),
+    "ticked": lambda t: (t.ticked, _due_order(t)),
+}
+
+@profiling.span("todos.iter_todos")
+def iter_todos(
+    filter: typing.Callable[[LazyToDoEntry], bool] | None = None,
+    order: str | typing.Callable[[LazyToDoEntry], typing.Any] | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> typing.Iterator[LazyToDoEntry]:
+    """
+    Iterate over the stored to-dos as `LazyToDoEntry`s.
+
+    `filter` selects entries, `order` is either the name of one of `ORDERS`
+    or a key function (the file order is kept if it is None), and
+    `limit`/`offset` select a page of the result. The `index` of every entry
+    is its position in the file, regardless of filtering and ordering, so it
+    can be passed to `del_todo` and `mark_todo`.
+
+    Without an `order`, iteration stops as soon as the page is full. With
+    one, only `offset + limit` entries are kept while sorting. In both cases
+    nothing is resolved until it is accessed.
+    """
+
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit can't be negative")
+
+    entries: typing.Iterable[LazyToDoEntry] = (
+        LazyToDoEntry(k, v, i) for i, (k, v) in enumerate(_load_todos().items())
+    )
+    if filter is not None:
+        entries = (t for t in entries if filter(t))
+
+    if order is not None:
+        key = ORDERS[order] if isinstance(order, str) else order
+        if limit is not None:
+            entries = heapq.nsmallest(offset + limit, entries, key=key)
+        else:
+            entries = sorted(entries, key=key)
+
+    stop = offset + limit if limit is not None else None
+    return itertools.islice(entries, offset, stop)
+
+def iter_due_dates(start: datetime.date, end: datetime.date) -> typing.Iterator[tuple[datetime.date, LazyToDoEntry]]:
+    """
+    Lazily yield `(date, to-do)` for every due date of an unticked to-do
+    within `[start, end]` in chronological order, including the future
+    occurrences of recurring to-dos, for calendar highlighting and reminders.
+    """
+
+    def due_dates(t: LazyToDoEntry) -> typing.Iterator[tuple[datetime.date, int, LazyToDoEntry]]:
+        if t.due is None or t.ticked:
+            return
+        if start <= t.due <= end:
+            yield t.due, t.index, t
+        if t.recurrence is not None:
+            for d in t.recurrence.occurrences(max(t.due, start - datetime.timedelta(days=1)), end):
+                yield d, t.index, t
+
+    # the index breaks ties, so entries never get compared
+    for d, _, t in heapq.merge(*(due_dates(t) for t in iter_todos())):
+        yield d, t
+
+@profiling.span("todos.match_todo_index")
 def match_todo_index(index: int) -> str:
     """
     Find a to-do name based on its index.
     """
 
-    with open(os.path.join(os.environ["HOME"], "./.local/todos.toml"), "rb") as f:
-        todos_tree: dict[str, ToDoEntryTypedDict] = toml_reader.load(f)
+    if index < 0:
+        raise exceptions.ToDoIndexError
 
-    for i, (_, v) in enumerate(todos_tree.items()):
-        if i == index:
-            return v["name"]
+    for t in iter_todos(offset=index, limit=1):
+        return t.key
     
     raise exceptions.ToDoIndexError 
 
@@ -100,13 +250,14 @@ def unwrap_name_or_index(name_or_index: int | str) -> str:
     
     raise exceptions.NameOrIndexUnwrappingError
 
+@profiling.span("todos.del_todo")
 def del_todo(name_or_index: int | str) -> str:
     """
     Delete a to-do.
     """
     name = unwrap_name_or_index(name_or_index)
 
-    with open(os.path.join(os.environ["HOME"], "./.local/todos.toml"), "rb") as f:
+    with profiling.open_file(config.get().todos_file, "rb") as f:
         todos_tree: dict[str, dict[str, ToDoEntryTypedDict]] = toml_reader.load(f)
     
     try:
@@ -114,27 +265,36 @@ def del_todo(name_or_index: int | str) -> str:
     except KeyError:
         raise exceptions.FatalError(f"The name {name} does not exist! Please re-evaluate your input.")
 
-    with open(os.path.join(os.environ["HOME"], "./.local/todos.toml"), "rb") as f:
+    with profiling.open_file(config.get().todos_file, "wb") as f:
         toml_writer.dump(todos_tree, f)
     
     return f"Deleted To-Do {name}."
     
+@profiling.span("todos.mark_todo")
 def mark_todo(name_or_index: int | str) -> str:
     """
     Tick a to-do as done/undone.
+
+    Ticking a recurring to-do moves it on to its next occurrence instead,
+    it only stays ticked once its rule has ended.
     """
     
     name = unwrap_name_or_index(name_or_index)
-    with open(os.path.join(os.environ["HOME"], "./.local/todos.toml"), "rb") as f:
+    with profiling.open_file(config.get().todos_file, "rb") as f:
         todos_tree: dict[str, dict[str, ToDoEntryTypedDict]] = toml_reader.load(f)
     
     todo = ToDoEntry.from_dict(todos_tree["todos"][name])
+    if not todo.ticked and todo.advance():
+        register_todo(todo, quiet=True, force=True)
+        return f"Moved recurring todo {name} on to {todo.due}"
+
     todo.ticked = not todo.ticked
 
     register_todo(todo, quiet=True, force=True)
 
     return f"Marked todo {name} as {todo.ticked}"
 
+@profiling.span("todos.register_todo")
 def register_todo(todo_entry: ToDoEntry, force: bool = False, quiet: bool = False) -> str | None:
     """
     Register a new To-Do.
@@ -156,7 +316,7 @@ def register_todo(todo_entry: ToDoEntry, force: bool = False, quiet: bool = Fals
     todo_entry.name.replace(" ", "_")
 
     # load todos
-    with open(os.path.join(os.environ["HOME"], "./.local/todos.toml"), "rb") as f:
+    with profiling.open_file(config.get().todos_file, "rb") as f:
         todos_tree: dict[str, dict[str, ToDoEntryTypedDict]] = toml_reader.load(f) # type: ignore
 
     # guard clause
@@ -172,7 +332,11 @@ def register_todo(todo_entry: ToDoEntry, force: bool = False, quiet: bool = Fals
     
     todos_tree["todos"][todo_entry.name] = todo_entry_dict
 
-    with open(os.path.join(os.environ["HOME"], "./.local/todos.toml"), "wb") as f:
+    with profiling.open_file(config.get().todos_file, "wb") as f:
         toml_writer.dump(todos_tree, f)
 
+    # archive imports this module, so it can't be imported at the top
+    from . import archive
+    archive.auto_archive(todos_tree)
+
     return f"Registered New To-Do: \n{t}"
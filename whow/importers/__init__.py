@@ -0,0 +1,331 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import csv
+import typing
+import datetime
+import collections
+import concurrent.futures
+
+from .. import (
+    exceptions,
+    profiling,
+    util
+)
+from ..data_structures import category, events
+
+# number of events handed to a worker at once
+DEFAULT_CHUNK_SIZE = 2000
+
+# CSV column name -> event field, matched case-insensitively
+CSV_COLUMNS = {
+    "name": "name",
+    "summary": "name",
+    "title": "name",
+    "subject": "name",
+    "start": "event_from",
+    "begin": "event_from",
+    "from": "event_from",
+    "dtstart": "event_from",
+    "event_from": "event_from",
+    "end": "event_to",
+    "to": "event_to",
+    "dtend": "event_to",
+    "event_to": "event_to",
+    "full_day": "full_day",
+    "all_day": "full_day",
+    "all day event": "full_day",
+    "categories": "categories",
+    "category": "categories",
+    "description": "description",
+}
+
+# Parsing (runs in the worker processes)
+
+def _parse_ics_datetime(value: str, params: str) -> tuple[datetime.datetime, bool]:
+    """
+    Parse an iCalendar DATE or DATE-TIME value into a naive local datetime,
+    also returning whether it was a date only (i.e. a full-day event).
+    """
+
+    # slicing is a lot cheaper than strptime, and this runs for every event
+    day = datetime.datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+    if ("VALUE=DATE" in params.upper() and "VALUE=DATE-TIME" not in params.upper()) or len(value) == 8:
+        return day, True
+
+    if value[8:9] != "T":
+        raise ValueError(f"Invalid iCalendar date-time {value}")
+    dt = day.replace(hour=int(value[9:11]), minute=int(value[11:13]), second=int(value[13:15]))
+
+    if value.endswith("Z"):
+        return dt.replace(tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None), False
+
+    # floating or TZID-qualified times are taken as local time
+    return dt, False
+
+def _unescape_ics_text(value: str) -> str:
+    return value.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+def _clean_category(name: str) -> str:
+    # categories are stored as <name>.toml, so they can't contain path separators
+    for sep in (os.sep, os.altsep, "\0"):
+        if sep:
+            name = name.replace(sep, "_")
+    name = name.strip().lower()
+    return "" if name in (".", "..") else name
+
+def _split_categories(value: str, separators: str = ",;") -> list[str]:
+    for sep in separators[1:]:
+        value = value.replace(sep, separators[0])
+    return [c for c in (_clean_category(c) for c in value.split(separators[0])) if c]
+
+def _finish_event(name: str, event_from: datetime.datetime, event_to: datetime.datetime | None, full_day: bool, categories: list[str], description: str) -> events.EventTypedDict:
+    if event_to is None or event_to < event_from:
+        event_to = event_from + datetime.timedelta(days=1) if full_day else event_from
+
+    return {
+        "index": 0,
+        "name": name.strip() or "untitled",
+        "full_day": full_day,
+        "event_from": event_from,
+        "event_to": event_to,
+        "categories": categories,
+        "description": description,
+    }
+
+def _normalize_ics_event(lines: list[str]) -> events.EventTypedDict:
+    name = ""
+    description = ""
+    categories: list[str] = []
+    event_from: datetime.datetime | None = None
+    event_to: datetime.datetime | None = None
+    full_day = False
+
+    for line in lines:
+        key, _, value = line.partition(":")
+        prop, _, params = key.partition(";")
+
+        match prop.upper():
+            case "SUMMARY":
+                name = _unescape_ics_text(value)
+            case "DESCRIPTION":
+                description = _unescape_ics_text(value)
+            case "CATEGORIES":
+                categories += _split_categories(_unescape_ics_text(value), ",")
+            case "DTSTART":
+                event_from, full_day = _parse_ics_datetime(value.strip(), params)
+            case "DTEND":
+                event_to, _ = _parse_ics_datetime(value.strip(), params)
+
+    if event_from is None:
+        raise ValueError("VEVENT without a DTSTART")
+
+    return _finish_event(name, event_from, event_to, full_day, categories, description)
+
+# the date formats whow accepts elsewhere, day first, with an optional time
+CSV_DATE_FORMATS = ["%d/%m/%Y", "%Y/%m/%d", "%b %d %Y", "%b %d, %Y"]
+CSV_TIME_FORMATS = [" %H:%M", " %H:%M:%S", " %I:%M %p", " %I:%M%p", " %I:%M:%S %p"]
+
+def _parse_csv_datetime(value: str) -> tuple[datetime.datetime, bool]:
+    """
+    Parse a CSV date or date-time, also returning whether it was a date only
+    (i.e. a full-day event). Raises ValueError for anything else; unlike the
+    util parsers this never prints or exits, since it runs in the workers.
+    """
+
+    value = value.strip()
+    try:
+        dt = datetime.datetime.fromisoformat(value)
+        # a bare date means a full-day event
+        return dt.replace(tzinfo=None), len(value) <= 10
+    except ValueError:
+        pass
+
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format), True
+        except ValueError:
+            pass
+        for time_format in CSV_TIME_FORMATS:
+            try:
+                return datetime.datetime.strptime(value, date_format + time_format), False
+            except ValueError:
+                pass
+
+    raise ValueError(f"Invalid date {value}")
+
+def _normalize_csv_event(row: dict[str, str]) -> events.EventTypedDict:
+    fields = {CSV_COLUMNS[k.strip().lower()]: v for k, v in row.items() if k is not None and k.strip().lower() in CSV_COLUMNS and v}
+
+    event_from, full_day = _parse_csv_datetime(fields["event_from"])
+    event_to = _parse_csv_datetime(fields["event_to"])[0] if "event_to" in fields else None
+    if "full_day" in fields:
+        full_day = fields["full_day"].strip().lower() in ("true", "yes", "1", "y")
+
+    return _finish_event(
+        fields.get("name", ""),
+        event_from,
+        event_to,
+        full_day,
+        _split_categories(fields.get("categories", "")),
+        fields.get("description", ""),
+    )
+
+def _normalize_chunk(kind: str, chunk: list[typing.Any], first: int) -> tuple[str, events.EventRangeTypedDict | None, int, set[str], int]:
+    """
+    Normalize a chunk of raw records and serialize them as one events file,
+    numbered from `first`. Serializing here keeps the main process down to
+    plain file writes.
+
+    Returns the TOML text, the time span of its events, the number of
+    events in it, the categories they use and the number of records that
+    had to be skipped.
+    """
+
+    normalize = _normalize_ics_event if kind == "ics" else _normalize_csv_event
+    event_dicts: list[events.EventTypedDict] = []
+    skipped = 0
+
+    for record in chunk:
+        try:
+            event_dicts.append(normalize(record))
+        except (KeyError, ValueError, IndexError):
+            skipped += 1
+
+    categories = {c for d in event_dicts for c in d["categories"]}
+    return events.dump_events(event_dicts, first), events.events_range(event_dicts), len(event_dicts), categories, skipped
+
+# Streaming (runs in the main process)
+
+def _iter_ics_records(f: typing.Iterable[str]) -> typing.Iterator[list[str]]:
+    """
+    Yield the unfolded content lines of every VEVENT, one event at a time.
+    """
+
+    record: list[str] | None = None
+    nested = 0 # depth inside VALARM and friends, whose properties are not needed
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        upper = line.upper()
+        if record is None:
+            if upper == "BEGIN:VEVENT":
+                record = []
+            continue
+
+        if upper.startswith("BEGIN:"):
+            nested += 1
+        elif upper == "END:VEVENT" and not nested:
+            yield record
+            record = None
+        elif upper.startswith("END:"):
+            nested -= 1
+        elif nested:
+            continue
+        elif line[:1] in (" ", "\t") and record:
+            record[-1] += line[1:]
+        else:
+            record.append(line)
+
+def _iter_chunks(records: typing.Iterable[typing.Any], chunk_size: int) -> typing.Iterator[list[typing.Any]]:
+    chunk: list[typing.Any] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def detect_format(path: str) -> str:
+    """
+    Guess whether `path` is an iCalendar or a CSV file from its extension.
+    Tab-separated .tsv files count as CSV, they are read with a tab delimiter.
+    """
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".ics", ".ical", ".ifb", ".icalendar"):
+        return "ics"
+    if ext in (".csv", ".tsv"):
+        return "csv"
+    raise exceptions.FatalError(f"Cannot tell the format of {path}, it should end with .ics or .csv!")
+
+@profiling.span("importers.import_events")
+def import_events(path: str, fmt: str | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int | None = None, quiet: bool = False) -> tuple[int, int]:
+    """
+    Import the events in an iCalendar (.ics) or CSV file.
+
+    The file is streamed in chunks of `chunk_size` events, which are parsed
+    and normalized by a pool of `workers` processes (one per core by default,
+    `workers=1` parses in this process) and written through the events index
+    one chunk at a time. At most two chunks per worker are in flight, so memory
+    use does not depend on the size of the file.
+
+    Categories that don't exist yet are registered with the default color.
+    Returns the number of events imported and the number of skipped records.
+    """
+
+    kind = fmt if fmt is not None else detect_format(path)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    imported = 0
+    skipped = 0
+    seen_categories: set[str] = set()
+
+    # every chunk gets its index range up front, so workers can number and
+    # serialize events on their own; skipped records just leave gaps
+    next_index = events.load_index()["next_index"]
+
+    def write(first: int, end: int, result: tuple[str, events.EventRangeTypedDict | None, int, set[str], int]) -> None:
+        nonlocal imported, skipped
+        toml_text, span, count, categories, batch_skipped = result
+        if count:
+            events.store_events(first, toml_text, end, span)
+        imported += count
+        skipped += batch_skipped
+        seen_categories.update(categories)
+        util.log(f"Imported {imported} events...") if not quiet else None
+
+    with profiling.open_file(path, "r", encoding="utf-8", newline="") as f:
+        records = _iter_ics_records(f) if kind == "ics" else csv.DictReader(f, delimiter="\t" if path.lower().endswith(".tsv") else ",")
+        chunks = _iter_chunks(records, chunk_size)
+
+        if workers <= 1:
+            for chunk in chunks:
+                first, next_index = next_index, next_index + len(chunk)
+                write(first, next_index, _normalize_chunk(kind, chunk, first))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight: collections.deque[tuple[int, int, concurrent.futures.Future]] = collections.deque()
+                for chunk in chunks:
+                    if len(in_flight) >= workers * 2:
+                        first, end, future = in_flight.popleft()
+                        write(first, end, future.result())
+                    first, next_index = next_index, next_index + len(chunk)
+                    in_flight.append((first, next_index, pool.submit(_normalize_chunk, kind, chunk, first)))
+                while in_flight:
+                    first, end, future = in_flight.popleft()
+                    write(first, end, future.result())
+
+    # categories only become known while streaming, so this has to come after
+    # the events; a category that can't be registered must not fail the import
+    for name in sorted(seen_categories):
+        try:
+            if not category.check_category_existence(name):
+                category.register_category(category.Category(name), quiet=True)
+        except OSError as e:
+            util.warn(f"Could not register the category {name}: {e.strerror}")
+
+    return imported, skipped
@@ -0,0 +1,261 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import io
+import os
+import sys
+import json
+import time
+import atexit
+import datetime
+import functools
+import typing
+
+ENV_VAR = "WHOW_PROFILE"
+
+class _State():
+    """
+    Process-wide profiling state.
+
+    Functions decorated with `span` while profiling is off are left
+    unwrapped, so they cost nothing. Everything else checks `state.enabled`
+    first and returns straight away if it is false, which costs a single
+    attribute lookup per call.
+    """
+
+    enabled: bool = False
+    output: str | None = None
+
+    def __init__(self) -> None:
+        self.spans: dict[str, list[float]] = {} # name -> [calls, total seconds, max seconds]
+        self.counters: dict[str, int] = {}
+
+    def record(self, name: str, elapsed: float) -> None:
+        s = self.spans.get(name)
+        if s is None:
+            self.spans[name] = [1, elapsed, elapsed]
+            return
+        s[0] += 1
+        s[1] += elapsed
+        if elapsed > s[2]:
+            s[2] = elapsed
+
+    def add(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+state = _State()
+
+def enable(output: str | None = None) -> None:
+    """
+    Turn profiling on. If `output` is a path, the report is written there
+    as JSON when the process exits, otherwise a summary is printed to stderr.
+    """
+
+    state.enabled = True
+    state.output = output
+
+def disable() -> None:
+    state.enabled = False
+
+def reset() -> None:
+    state.spans.clear()
+    state.counters.clear()
+
+def consume_flag(argv: list[str]) -> list[str]:
+    """
+    Strip `--profile` or `--profile=<file.json>` out of `argv`, enabling
+    profiling if it was present, and return the remaining arguments.
+
+    Spans are only attached when the functions are defined, so this has to
+    run before the rest of whow is imported.
+    """
+
+    remaining: list[str] = []
+    for arg in argv:
+        if arg == "--profile":
+            enable()
+        elif arg.startswith("--profile="):
+            enable(arg.split("=", 1)[1] or None)
+        else:
+            remaining.append(arg)
+    return remaining
+
+def span(name: str) -> typing.Callable[[typing.Callable[..., typing.Any]], typing.Callable[..., typing.Any]]:
+    """
+    Decorator that times every call of the wrapped function under `name`.
+
+    If profiling is off when the function is defined, it is returned as is,
+    so that per-entry helpers don't pay for an extra call.
+    """
+
+    def decorator(fn: typing.Callable[..., typing.Any]) -> typing.Callable[..., typing.Any]:
+        if not state.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not state.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                state.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class Span():
+    """
+    Context manager version of `span`, for timing a block instead of a whole function.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        if state.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        if state.enabled:
+            state.record(self.name, time.perf_counter() - self.start)
+
+def now() -> datetime.datetime:
+    """
+    `datetime.datetime.now()`, counted.
+    """
+
+    if state.enabled:
+        state.add("datetime_now_calls")
+    return datetime.datetime.now()
+
+class _CountingRaw(io.RawIOBase):
+    """
+    Raw binary stream that counts the bytes going through it. Buffering and
+    text decoding are layered on top of it, so text-mode files count bytes
+    on disk rather than characters.
+    """
+
+    def __init__(self, raw: io.FileIO) -> None:
+        self._raw = raw
+
+    def readable(self) -> bool:
+        return self._raw.readable()
+
+    def writable(self) -> bool:
+        return self._raw.writable()
+
+    def seekable(self) -> bool:
+        return self._raw.seekable()
+
+    def seek(self, *args) -> int:
+        return self._raw.seek(*args)
+
+    def tell(self) -> int:
+        return self._raw.tell()
+
+    def fileno(self) -> int:
+        return self._raw.fileno()
+
+    def readinto(self, b) -> int | None:
+        n = self._raw.readinto(b)
+        if n:
+            state.add("bytes_read", n)
+        return n
+
+    def write(self, b) -> int | None:
+        n = self._raw.write(b)
+        if n:
+            state.add("bytes_written", n)
+        return n
+
+    def close(self) -> None:
+        self._raw.close()
+        super().close()
+
+def _open_counting(path: str, mode: str, encoding: str | None = None, errors: str | None = None, newline: str | None = None) -> typing.Any:
+    raw = _CountingRaw(io.FileIO(path, mode.replace("b", "").replace("t", "")))
+
+    buffered: io.BufferedIOBase
+    if "+" in mode:
+        buffered = io.BufferedRandom(raw)
+    elif "r" in mode:
+        buffered = io.BufferedReader(raw)
+    else:
+        buffered = io.BufferedWriter(raw)
+
+    if "b" in mode:
+        return buffered
+    return io.TextIOWrapper(buffered, encoding=io.text_encoding(encoding), errors=errors, newline=newline)
+
+def open_file(path: str, mode: str = "r", **kwargs) -> typing.Any:
+    """
+    `open()`, counting files opened and bytes read/written when profiling is enabled.
+    """
+
+    if not state.enabled:
+        return open(path, mode, **kwargs)
+    state.add("files_opened")
+    return _open_counting(path, mode, **kwargs)
+
+def report() -> dict[str, typing.Any]:
+    """
+    Return the collected spans and counters as a JSON-serializable dictionary.
+    """
+
+    return {
+        "spans": {
+            name: {
+                "calls": int(s[0]),
+                "total_ms": s[1] * 1000,
+                "mean_ms": s[1] * 1000 / s[0],
+                "max_ms": s[2] * 1000,
+            }
+            for name, s in state.spans.items()
+        },
+        "counters": dict(state.counters),
+    }
+
+def sreport() -> str:
+    """
+    Return a human-readable per-span summary, slowest span first.
+    """
+
+    r = report()
+    lines = [f"{'span':<32}{'calls':>8}{'total ms':>12}{'mean ms':>12}{'max ms':>12}"]
+    for name, s in sorted(r["spans"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True):
+        lines.append(f"{name:<32}{s['calls']:>8}{s['total_ms']:>12.3f}{s['mean_ms']:>12.3f}{s['max_ms']:>12.3f}")
+    if r["counters"]:
+        lines.append("")
+        for name, n in sorted(r["counters"].items()):
+            lines.append(f"{name:<32}{n:>8}")
+    return "\n".join(lines)
+
+@atexit.register
+def _flush() -> None:
+    if not state.enabled or not (state.spans or state.counters):
+        return
+    if state.output is not None:
+        with open(state.output, "w") as f:
+            json.dump(report(), f, indent=4)
+    else:
+        print(sreport(), file=sys.stderr)
+
+# WHOW_PROFILE=1 prints a summary, WHOW_PROFILE=<file.json> writes JSON
+_env = os.environ.get(ENV_VAR, "")
+if _env and _env != "0":
+    enable(None if _env in ("1", "true", "yes") else _env)
+del _env
@@ -14,10 +14,12 @@
 
 import math
 import shutil
+import typing
 import datetime
 
 from ..exceptions import *
-from ..config import *
+from .. import config
+from .. import profiling
 
 def clean_empty_strings_in_list(l: list[str]) -> list[str]:
     for count, element in enumerate(l):
@@ -32,13 +34,15 @@ def indexify_weekday(weekday: int) -> int:
 
     return 0 if weekday == 6 else weekday+1
 
-def emoji(emoji: str, cfg: Config = Config()) -> str | None:
+def emoji(emoji: str, cfg: config.Config | None = None) -> str | None:
     """
     Print out an emoji if `enable_emojis` is set to true on the configuration.
     """
+    cfg = cfg if cfg is not None else config.get()
     if cfg.enable_emojis:
         return emoji
 
+@profiling.span("util.sfprint")
 def sfprint(string: str, padding: int = 0, flowtext: bool = True) -> str:
     """
     Return a string, omitting overflowed text based
@@ -51,6 +55,7 @@ def sfprint(string: str, padding: int = 0, flowtext: bool = True) -> str:
 
     return(f"{text_padding}{string[0:term_width]}{overflow}")
 
+@profiling.span("util.print_center")
 def print_center(string: str, width: int, bias_left: bool = True, return_string: bool = False) -> typing.Union[str, None]:
     """
     Center out a string in a given area (width: int)
@@ -77,6 +82,7 @@ def print_center(string: str, width: int, bias_left: bool = True, return_string:
         print(f"{' '*int(padding_width/2)}{string}{''*int(padding_width/2)}")
 
 # Datetime Handling
+@profiling.span("util.unify_date_formats")
 def unify_date_formats(string: str) -> str:
     # The time format stays uniform, whereas
     # there are multiple supported date formats,
@@ -127,6 +133,7 @@ def unify_date_formats(string: str) -> str:
 
     raise DateFormattingError()
 
+@profiling.span("util.parse_argv_event_datetime")
 def parse_argv_event_datetime(string: str) -> datetime.datetime:
     # either:
     #   "mm/dd/YYYY 6:09:34 PM" | "mm/dd/YYYY 6:09PM"
@@ -159,6 +166,7 @@ def parse_argv_event_datetime(string: str) -> datetime.datetime:
 
     return datetime.datetime(int(date_part_list[2]), int(date_part_list[1]), int(date_part_list[0]), time_part.hour, time_part.minute, time_part.second)
 
+@profiling.span("util.split_string_date")
 def split_string_date(string_date: str) -> datetime.date:
     """
     Split a string date in the date/month/year format into a datetime.date object.
@@ -0,0 +1,232 @@
+#    Copyright 2023 ezntek (ezntek@xflymusic.com) and DaringCuteSeal (daringcuteseal@gmail.com)
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import typing
+import threading
+import dataclasses
+
+try:
+    import tomllib as toml_reader
+except:
+    import tomli as toml_reader
+
+from .. import (
+    config,
+    profiling
+)
+
+DEFAULT_INTERVAL = 1.0
+
+Kind = typing.Literal["todo", "category", "event"]
+Action = typing.Literal["added", "modified", "deleted"]
+
+# what identifies a version of a file: a rewrite through rename changes the
+# inode, an in-place one the mtime and usually the size
+StatSignature = tuple[int, int, int]
+
+@dataclasses.dataclass
+class ChangeEvent():
+    kind: Kind
+    action: Action
+    key: str | int # the name for to-dos and categories, the stored index for events
+    path: str
+    old: dict[str, typing.Any] | None = None
+    new: dict[str, typing.Any] | None = None
+
+@dataclasses.dataclass
+class _WatchedFile():
+    kind: Kind
+    signature: StatSignature | None = None
+    version: int = 0
+    entries: dict[str | int, dict[str, typing.Any]] = dataclasses.field(default_factory=dict)
+
+def _signature(path: str) -> StatSignature | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+@profiling.span("watch.parse")
+def _parse(path: str, kind: Kind) -> dict[str | int, dict[str, typing.Any]] | None:
+    """
+    Parse a watched file into its entries, keyed by what identifies them:
+    the name for to-dos and categories, and the index for events, whose
+    names don't have to be unique. Returns None if the file could not be
+    read completely.
+    """
+
+    try:
+        with profiling.open_file(path, "rb") as f:
+            tree = toml_reader.load(f)
+    except FileNotFoundError:
+        return {}
+    except toml_reader.TOMLDecodeError:
+        # caught halfway through a write, the next poll will see the rest
+        return None
+
+    match kind:
+        case "todo":
+            return tree.get("todos", {})
+        case "category":
+            # one category per file
+            return {tree.get("name", os.path.splitext(os.path.basename(path))[0]): tree}
+        case "event":
+            return {v.get("index", k): v for k, v in tree.items() if isinstance(v, dict)}
+
+def _diff(kind: Kind, path: str, old: dict[str | int, dict[str, typing.Any]], new: dict[str | int, dict[str, typing.Any]]) -> list[ChangeEvent]:
+    retval: list[ChangeEvent] = []
+    for key, entry in new.items():
+        if key not in old:
+            retval.append(ChangeEvent(kind, "added", key, path, None, entry))
+        elif old[key] != entry:
+            retval.append(ChangeEvent(kind, "modified", key, path, old[key], entry))
+    for key, entry in old.items():
+        if key not in new:
+            retval.append(ChangeEvent(kind, "deleted", key, path, entry, None))
+    return retval
+
+class Watcher():
+    """
+    Polls the data tree with `os.stat` and reports what changed in it.
+
+    Every poll stats the to-dos file, the category and events directories
+    and the files already known to be in them. Only files whose stat
+    signature changed are parsed again, and their entries are diffed against
+    the last known ones, so a frontend can patch just the affected rows.
+    Directories are only listed again when their own mtime changes.
+
+    Nothing is read on construction. Call `snapshot()` to record the
+    current state without reporting it (this parses the whole tree, so it
+    blocks), or skip it and let the first `poll()` report every entry as
+    added, e.g. to fill a frontend. `watch()` takes the snapshot itself if
+    none was taken yet.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL) -> None:
+        self.interval = interval
+        self.files: dict[str, _WatchedFile] = {}
+        self.dir_signatures: dict[str, StatSignature | None] = {}
+        self._listing: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+        self._rescan = False
+        self.primed = False
+        config.subscribe(self._on_config_reload)
+
+    def snapshot(self) -> None:
+        """
+        Record the current state of the data tree without reporting it.
+        """
+
+        self.poll()
+
+    def _on_config_reload(self, _: config.Config) -> None:
+        # the paths may have moved; deletions/additions get reported on the next poll
+        self._rescan = True
+
+    def version(self, path: str) -> int:
+        """
+        Return how many times a change to `path` was seen.
+        """
+
+        watched = self.files.get(path)
+        return watched.version if watched is not None else 0
+
+    def _watched_paths(self) -> dict[str, Kind]:
+        cfg = config.get()
+        paths: dict[str, Kind] = {cfg.todos_file: "todo"}
+
+        for directory, kind in ((cfg.categories_dir, "category"), (cfg.events_dir, "event")):
+            signature = _signature(directory)
+            if self._rescan or directory not in self._listing or signature != self.dir_signatures[directory]:
+                self.dir_signatures[directory] = signature
+                try:
+                    names = os.listdir(directory)
+                except FileNotFoundError:
+                    names = []
+                self._listing[directory] = [
+                    os.path.join(directory, n) for n in names
+                    if n.endswith(".toml") and not (kind == "event" and n == "index.toml")
+                ]
+            for path in self._listing.get(directory, []):
+                paths[path] = kind # type: ignore
+
+        self._rescan = False
+        return paths
+
+    @profiling.span("watch.poll")
+    def poll(self) -> list[ChangeEvent]:
+        """
+        Check the data tree once, returning the changes since the last poll.
+        """
+
+        changes: list[ChangeEvent] = []
+        self.primed = True
+        with self._lock:
+            paths = self._watched_paths()
+
+            for path, kind in paths.items():
+                signature = _signature(path)
+                watched = self.files.get(path)
+                if watched is None:
+                    watched = self.files[path] = _WatchedFile(kind)
+                if signature == watched.signature:
+                    continue
+
+                entries = _parse(path, kind) if signature is not None else {}
+                if entries is None:
+                    # keep the last good entries, and only retry once the file changes again
+                    watched.signature = signature
+                    continue
+                changes += _diff(kind, path, watched.entries, entries)
+                watched.signature = signature
+                watched.entries = entries
+                watched.version += 1
+
+            for path in [p for p in self.files if p not in paths]:
+                watched = self.files.pop(path)
+                changes += _diff(watched.kind, path, watched.entries, {})
+
+        return changes
+
+    def watch(self, stop: threading.Event | None = None) -> typing.Iterator[list[ChangeEvent]]:
+        """
+        Poll every `interval` seconds until `stop` is set (or forever),
+        yielding the changes of every poll that found any.
+        """
+
+        stop = stop if stop is not None else threading.Event()
+        if not self.primed:
+            self.snapshot()
+        while not stop.wait(self.interval):
+            config.reload_if_changed()
+            changes = self.poll()
+            if changes:
+                yield changes
+
+    def close(self) -> None:
+        config.unsubscribe(self._on_config_reload)
+
+def watch(interval: float = DEFAULT_INTERVAL, stop: threading.Event | None = None) -> typing.Iterator[list[ChangeEvent]]:
+    """
+    Yield batches of `ChangeEvent`s as the data tree changes.
+    See `Watcher` for how changes are detected.
+    """
+
+    watcher = Watcher(interval)
+    try:
+        yield from watcher.watch(stop)
+    finally:
+        watcher.close()